@@ -6,9 +6,124 @@ Detects forged certificates by comparing with database records
 import json
 import sys
 import re
+from dataclasses import dataclass
 from typing import Dict, List, Optional
 from datetime import datetime
 import hashlib
+import math
+
+
+# Field extraction patterns, compiled once at import and tried in order
+_NAME_PATS = [re.compile(p, re.IGNORECASE) for p in (
+    r'(?:name|holder|awarded to|presented to)[:\s]+([A-Z][a-z]+(?: [A-Z][a-z]+)+)',
+    r'(?:mr\.|ms\.|mrs\.|dr\.)\s+([A-Z][a-z]+(?: [A-Z][a-z]+)+)',
+    r'(?:this is to certify that)\s+([A-Z][a-z]+(?: [A-Z][a-z]+)+)'
+)]
+
+_DATE_PATS = [re.compile(p, re.IGNORECASE) for p in (
+    r'(?:date|issued on|awarded on)[:\s]+(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
+    r'(\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4})',
+    r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})'
+)]
+
+_CERT_PATS = [re.compile(p, re.IGNORECASE) for p in (
+    r'(?:certificate|cert|serial|reg|registration) (?:no|number|#)[:\s]*([A-Z0-9-]+)',
+    r'(?:number|no)[:\s]*([A-Z]{2,4}[-]?\d{4,8})'
+)]
+
+_AUTH_PATS = [re.compile(p, re.IGNORECASE) for p in (
+    r'(?:issued by|awarded by|from|by)[:\s]+([A-Z][a-z]+(?: [A-Z][a-z]+){1,5})',
+    r'(University of [A-Z][a-z]+)',
+    r'((?:[A-Z][a-z]+\s+){1,3}(?:University|Institute|College|Academy))'
+)]
+
+_QUAL_PATS = [re.compile(p, re.IGNORECASE) for p in (
+    r'(Bachelor of (?:Arts|Science|Engineering|Technology))',
+    r'(Master of (?:Arts|Science|Engineering|Technology|Business Administration))',
+    r'((?:B\.?S\.?|M\.?S\.?|B\.?Tech|M\.?Tech|MBA|Ph\.?D\.?))',
+    r'(?:degree|diploma|certificate) (?:in|of)\s+([A-Za-z\s]+)'
+)]
+
+# Extracted fields and their patterns. Earlier patterns take priority over
+# later ones wherever they match, so each field is scanned pattern by
+# pattern rather than with one leftmost-match alternation. Values come from
+# capture groups under Python's Unicode IGNORECASE rules, which is why a
+# multi-pattern DFA scanner (e.g. Hyperscan, offsets only) is not used here.
+_FIELD_PATTERNS = (
+    ('holder_name', _NAME_PATS),
+    ('issue_date', _DATE_PATS),
+    ('certificate_number', _CERT_PATS),
+    ('issuing_authority', _AUTH_PATS),
+    ('qualification', _QUAL_PATS)
+)
+
+
+def _first_match(patterns, text: str) -> Optional[str]:
+    """Return the captured value of the first pattern that matches text."""
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+# Template similarity above which a known certificate counts as a template match
+_TEMPLATE_THRESHOLD = 0.85
+
+# Fields compared for duplicates; the partial ones also score word overlap
+_DUPLICATE_FIELDS = ('holder_name', 'certificate_number', 'issuing_authority', 'qualification')
+_PARTIAL_FIELDS = ('holder_name', 'issuing_authority')
+
+
+def _template_prefix(tokens) -> List[str]:
+    """
+    Prefix-filter tokens of a template token set.
+    
+    Under a fixed token order, two sets with Jaccard similarity of at least
+    _TEMPLATE_THRESHOLD always share a token from their prefixes, so indexing
+    only prefixes finds every possible match.
+    """
+    ordered = sorted(tokens)
+    min_overlap = math.ceil(len(ordered) * _TEMPLATE_THRESHOLD - 1e-9)
+    return ordered[:len(ordered) - min_overlap + 1]
+
+
+def _lower_info(info: Dict) -> Dict:
+    """Lowercase the values of an extracted info dict, keeping empty ones."""
+    return {field: (value.lower() if value else value) for field, value in info.items()}
+
+
+def _info_keys(info_lower: Dict) -> set:
+    """Index keys shared by any two lowercased infos that can score as duplicates."""
+    keys = set()
+    for field in _DUPLICATE_FIELDS:
+        value = info_lower.get(field)
+        if value:
+            keys.add((field, value))
+            if field in _PARTIAL_FIELDS:
+                keys.update((field, word) for word in value.split())
+    return keys
+
+
+@dataclass
+class KnownCert:
+    """
+    Comparison features of one known certificate, kept beside it
+    """
+    __slots__ = ('cert', 'text', 'info', 'template_tokens', 'info_lower')
+    
+    cert: Dict
+    # The text and a copy of the extracted info the features were built from
+    text: str
+    info: Dict
+    template_tokens: frozenset
+    info_lower: Dict
+    
+    def describes(self, cert: Dict) -> bool:
+        """Whether these features were built from cert as it is now."""
+        text = cert.get('text', '')
+        return (self.cert is cert and (self.text is text or self.text == text)
+                and self.info == cert.get('extracted_info', {}))
 
 
 class CertificateForgeryDetector:
@@ -20,105 +135,45 @@ class CertificateForgeryDetector:
         """Initialize the certificate forgery detector."""
         self.known_certificates = []
         
+        # KnownCert features per position in known_certificates, and inverted
+        # indexes over them (token/key -> positions); extended lazily as
+        # certificates are appended and rebuilt when any entry changes
+        self._known_features = []
+        self._template_index = {}
+        self._info_index = {}
+        
     def extract_certificate_info(self, text: str) -> Dict:
         """Extract key information from certificate text."""
-        info = {
-            'holder_name': None,
-            'issue_date': None,
-            'certificate_number': None,
-            'issuing_authority': None,
-            'qualification': None
-        }
-        
-        # Extract name (common patterns)
-        name_patterns = [
-            r'(?:name|holder|awarded to|presented to)[:\s]+([A-Z][a-z]+(?: [A-Z][a-z]+)+)',
-            r'(?:mr\.|ms\.|mrs\.|dr\.)\s+([A-Z][a-z]+(?: [A-Z][a-z]+)+)',
-            r'(?:this is to certify that)\s+([A-Z][a-z]+(?: [A-Z][a-z]+)+)'
-        ]
-        
-        for pattern in name_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                info['holder_name'] = match.group(1).strip()
-                break
-        
-        # Extract date patterns
-        date_patterns = [
-            r'(?:date|issued on|awarded on)[:\s]+(\d{1,2}[-/]\d{1,2}[-/]\d{2,4})',
-            r'(\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\s+\d{4})',
-            r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})'
-        ]
-        
-        for pattern in date_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                info['issue_date'] = match.group(1).strip()
-                break
-        
-        # Extract certificate number
-        cert_patterns = [
-            r'(?:certificate|cert|serial|reg|registration) (?:no|number|#)[:\s]*([A-Z0-9-]+)',
-            r'(?:number|no)[:\s]*([A-Z]{2,4}[-]?\d{4,8})'
-        ]
-        
-        for pattern in cert_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                info['certificate_number'] = match.group(1).strip()
-                break
-        
-        # Extract issuing authority
-        auth_patterns = [
-            r'(?:issued by|awarded by|from|by)[:\s]+([A-Z][a-z]+(?: [A-Z][a-z]+){1,5})',
-            r'(University of [A-Z][a-z]+)',
-            r'((?:[A-Z][a-z]+\s+){1,3}(?:University|Institute|College|Academy))'
-        ]
-        
-        for pattern in auth_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                info['issuing_authority'] = match.group(1).strip()
-                break
-        
-        # Extract qualification/degree
-        qual_patterns = [
-            r'(Bachelor of (?:Arts|Science|Engineering|Technology))',
-            r'(Master of (?:Arts|Science|Engineering|Technology|Business Administration))',
-            r'((?:B\.?S\.?|M\.?S\.?|B\.?Tech|M\.?Tech|MBA|Ph\.?D\.?))',
-            r'(?:degree|diploma|certificate) (?:in|of)\s+([A-Za-z\s]+)'
-        ]
-        
-        for pattern in qual_patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                info['qualification'] = match.group(1).strip()
-                break
+        info = {}
+        for field, patterns in _FIELD_PATTERNS:
+            info[field] = _first_match(patterns, text)
         
         return info
     
     def calculate_similarity(self, info1: Dict, info2: Dict) -> float:
         """Calculate similarity between two certificate information dictionaries."""
+        return self._similarity_lower(_lower_info(info1), _lower_info(info2))
+    
+    def _similarity_lower(self, info1: Dict, info2: Dict) -> float:
+        """calculate_similarity for info dicts whose values are already lowercased."""
         score = 0
         total_fields = 0
         
-        fields_to_compare = ['holder_name', 'certificate_number', 'issuing_authority', 'qualification']
-        
-        for field in fields_to_compare:
+        for field in _DUPLICATE_FIELDS:
             val1 = info1.get(field)
             val2 = info2.get(field)
             
             if val1 and val2:
                 total_fields += 1
                 # Exact match
-                if val1.lower() == val2.lower():
+                if val1 == val2:
                     score += 1
                 # Partial match (for names and authorities)
-                elif field in ['holder_name', 'issuing_authority']:
-                    words1 = set(val1.lower().split())
-                    words2 = set(val2.lower().split())
-                    overlap = len(words1.intersection(words2))
-                    total = len(words1.union(words2))
+                elif field in _PARTIAL_FIELDS:
+                    words1 = set(val1.split())
+                    words2 = set(val2.split())
+                    overlap = len(words1 & words2)
+                    total = len(words1) + len(words2) - overlap
                     if total > 0:
                         score += overlap / total
         
@@ -126,22 +181,20 @@ class CertificateForgeryDetector:
     
     def find_template_match(self, text: str, cert_info: Dict) -> Optional[Dict]:
         """Find if certificate matches known template but with different credentials."""
-        text_lower = text.lower()
-        text_clean = re.sub(r'\s+', ' ', text_lower).strip()
+        text_clean = ' '.join(text.lower().split())
+        
+        # Remove personal info so only the structure is compared; the query
+        # template is the same for every known certificate
+        text_tokens = set(self.create_template(text_clean, cert_info).split())
         
-        for known_cert in self.known_certificates:
-            known_text = known_cert.get('text', '').lower()
-            known_text_clean = re.sub(r'\s+', ' ', known_text).strip()
-            known_info = known_cert.get('extracted_info', {})
+        for pos in self._candidates(self._template_index, _template_prefix(text_tokens)):
+            known = self._known_features[pos]
+            known_info = known.info
             
             # Check if template matches but credentials differ
-            # Remove personal info and compare structure
-            text_template = self.create_template(text_clean, cert_info)
-            known_template = self.create_template(known_text_clean, known_info)
+            template_similarity = self._token_jaccard(text_tokens, known.template_tokens)
             
-            template_similarity = self.calculate_template_similarity(text_template, known_template)
-            
-            if template_similarity > 0.85:  # High template similarity
+            if template_similarity > _TEMPLATE_THRESHOLD:  # High template similarity
                 # Check if credentials are different
                 credentials_different = (
                     cert_info.get('holder_name') != known_info.get('holder_name') or
@@ -150,7 +203,7 @@ class CertificateForgeryDetector:
                 
                 if credentials_different:
                     return {
-                        'matched_certificate': known_cert.get('id'),
+                        'matched_certificate': known.cert.get('id'),
                         'template_similarity': round(template_similarity * 100, 2),
                         'original_holder': known_info.get('holder_name'),
                         'original_cert_number': known_info.get('certificate_number'),
@@ -175,17 +228,70 @@ class CertificateForgeryDetector:
     
     def calculate_template_similarity(self, template1: str, template2: str) -> float:
         """Calculate similarity between two templates."""
-        words1 = set(template1.split())
-        words2 = set(template2.split())
-        
+        return self._token_jaccard(set(template1.split()), set(template2.split()))
+    
+    def _token_jaccard(self, words1: set, words2: set) -> float:
+        """Jaccard similarity between two template token sets."""
         if not words1 or not words2:
             return 0.0
         
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
+        intersection = len(words1 & words2)
+        union = len(words1) + len(words2) - intersection
         
         return intersection / union if union > 0 else 0.0
     
+    def _build_known(self, known_cert: Dict) -> KnownCert:
+        """Compute the cached comparison features of a known certificate."""
+        text = known_cert.get('text', '')
+        known_info = dict(known_cert.get('extracted_info', {}))
+        text_clean = ' '.join(text.lower().split())
+        template = self.create_template(text_clean, known_info)
+        return KnownCert(
+            cert=known_cert,
+            text=text,
+            info=known_info,
+            template_tokens=frozenset(template.split()),
+            info_lower=_lower_info(known_info)
+        )
+    
+    def _sync_index(self):
+        """Bring cached features and indexes in line with known_certificates."""
+        known_certificates = self.known_certificates
+        features = self._known_features
+        
+        # The indexes are keyed by position, so removing, replacing or editing
+        # any cached entry invalidates them; appends only extend them
+        if len(features) > len(known_certificates) or not all(
+                known.describes(cert) for known, cert in zip(features, known_certificates)):
+            # Reuse features of certificates that merely moved; each cached
+            # KnownCert holds its dict, so these ids stay unique meanwhile
+            reusable = {id(known.cert): known for known in features}
+            features = self._known_features = []
+            # Cleared in place: callers hold these while _candidates syncs
+            self._template_index.clear()
+            self._info_index.clear()
+        else:
+            reusable = {}
+        
+        for pos in range(len(features), len(known_certificates)):
+            known_cert = known_certificates[pos]
+            known = reusable.get(id(known_cert))
+            if known is None or not known.describes(known_cert):
+                known = self._build_known(known_cert)
+            features.append(known)
+            for token in _template_prefix(known.template_tokens):
+                self._template_index.setdefault(token, []).append(pos)
+            for key in _info_keys(known.info_lower):
+                self._info_index.setdefault(key, []).append(pos)
+    
+    def _candidates(self, index: Dict, keys) -> List[int]:
+        """Positions of known certificates sharing a key, in insertion order."""
+        self._sync_index()
+        positions = set()
+        for key in keys:
+            positions.update(index.get(key, ()))
+        return sorted(positions)
+    
     def analyze_certificate(self, text: str, cert_id: str = None) -> Dict:
         """
         Perform comprehensive forgery detection analysis.
@@ -205,17 +311,19 @@ class CertificateForgeryDetector:
         
         is_forged = template_match is not None
         
-        # Check against exact duplicates
+        # Check against exact duplicates; only certificates sharing a field
+        # value or word with this one can score above zero
         duplicates = []
-        for known_cert in self.known_certificates:
-            known_info = known_cert.get('extracted_info', {})
-            similarity = self.calculate_similarity(cert_info, known_info)
+        cert_info_lower = _lower_info(cert_info)
+        for pos in self._candidates(self._info_index, _info_keys(cert_info_lower)):
+            known = self._known_features[pos]
+            similarity = self._similarity_lower(cert_info_lower, known.info_lower)
             
             if similarity > 0.90:  # Very high similarity
                 duplicates.append({
-                    'certificate_id': known_cert.get('id'),
+                    'certificate_id': known.cert.get('id'),
                     'similarity': round(similarity * 100, 2),
-                    'holder_name': known_info.get('holder_name')
+                    'holder_name': known.info.get('holder_name')
                 })
         
         result = {
@@ -274,12 +382,13 @@ class CertificateForgeryDetector:
         if extracted_info is None:
             extracted_info = self.extract_certificate_info(text)
         
-        self.known_certificates.append({
+        known_cert = {
             'id': cert_id,
             'text': text,
             'extracted_info': extracted_info,
             'added_date': datetime.now().isoformat()
-        })
+        }
+        self.known_certificates.append(known_cert)
     
     def load_known_certificates(self, certificates: List[Dict]):
         """Load multiple known certificates."""
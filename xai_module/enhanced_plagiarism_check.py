@@ -4,13 +4,171 @@ Uses advanced algorithms for document similarity detection and plagiarism checki
 """
 
 import hashlib
+import heapq
 import json
 import sys
-from typing import Dict, List, Tuple
-from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Tuple
+from collections import Counter, defaultdict
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
 import re
 
 
+# Runs of characters that are neither word characters nor whitespace
+_CLEAN_RE = re.compile(r'[^\w\s]+')
+
+
+def _tokens_to_ids(words: List[str], vocab: Dict[str, int]) -> List[int]:
+    """Map words to integer ids, adding unseen words to vocab."""
+    return [vocab.setdefault(word, len(vocab)) for word in words]
+
+
+def _query_ids(words: List[str], vocab: Dict[str, int]) -> List[int]:
+    """
+    Map words to integer ids without growing vocab.
+    
+    Words vocab has not seen get fresh ids past its end, distinct from each
+    other and from every known word, so queries do not bloat the vocabulary.
+    """
+    unseen = {}
+    base = len(vocab)
+    return [vocab[word] if word in vocab else unseen.setdefault(word, base + len(unseen))
+            for word in words]
+
+
+def _ngram_keys(ids: List[int], n: int = 3) -> set:
+    """
+    Set of n-grams over token ids, each packed into a single int.
+    
+    Ids take 32 bits each, so every n-gram maps to a distinct key.
+    """
+    keys = ids[:len(ids) - n + 1] if len(ids) >= n else []
+    for k in range(1, n):
+        keys = [(key << 32) | token_id for key, token_id in zip(keys, ids[k:])]
+    return set(keys)
+
+
+def _iter_tokens(fp, chunk_size: int = 65536):
+    """
+    Yield preprocessed words from a text file, reading it in chunks.
+    
+    Produces the same words as preprocess_tokens on the whole file. Text
+    after the last whitespace of a chunk may be a partial word, so it is
+    held back until whitespace or the end of the file completes it.
+    """
+    # Pieces of a word not yet ended by whitespace; joined once it is, so a
+    # long run without whitespace is not rescanned on every read
+    pending = []
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        if chunk[-1].isspace():
+            tail = ''
+        else:
+            # The last field of a chunk ending in a non-space is its tail
+            tail = chunk.rsplit(None, 1)[-1]
+            if len(tail) == len(chunk):
+                pending.append(chunk)
+                continue
+        pending.append(chunk[:len(chunk) - len(tail)])
+        complete = ''.join(pending)
+        pending = [tail]
+        yield from _CLEAN_RE.sub(' ', complete.lower()).split()
+    yield from _CLEAN_RE.sub(' ', ''.join(pending).lower()).split()
+
+
+def _extend_match(words1: List[str], words2: List[str], i: int, j: int, length: int) -> int:
+    """
+    Length of the common run of words starting at words1[i] and words2[j].
+    
+    The first length words are known to match. Rather than stepping one word
+    at a time, compare slices in doubling steps until one differs, then
+    halve the step to home in on the first mismatch; the slice comparisons
+    run in C, so long matches take O(log n) Python iterations.
+    """
+    limit = min(len(words1) - i, len(words2) - j)
+    step = 1
+    growing = True
+    while step and length < limit:
+        end = min(length + step, limit)
+        if words1[i + length:i + end] == words2[j + length:j + end]:
+            length = end
+            if growing:
+                step *= 2
+        else:
+            growing = False
+            step //= 2
+    return length
+
+
+def _top_spans(spans: Iterable[Tuple[int, int, int]],
+               k: int) -> Tuple[int, List[Tuple[int, int, int]]]:
+    """
+    Count (position1, position2, length) spans and keep the k longest.
+    
+    A bounded min-heap holds the best k seen so far, so the spans are never
+    stored in full. Among equal lengths the earliest span wins; the result
+    is longest first.
+    """
+    count = 0
+    heap = []
+    for i, j, length in spans:
+        # Negated arrival order makes earlier spans compare larger on ties
+        entry = (length, -count, i, j)
+        count += 1
+        if len(heap) < k:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return count, [(i, j, length) for length, _, i, j in sorted(heap, reverse=True)]
+
+
+def _jaccard_from_sizes(size1: int, size2: int, intersection: int) -> float:
+    """Jaccard similarity of two sets given their sizes and overlap."""
+    union = size1 + size2 - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _magnitude(counter: Counter) -> float:
+    """Euclidean norm of a term frequency vector."""
+    return sum(count ** 2 for count in counter.values()) ** 0.5
+
+
+@dataclass
+class KnownDoc:
+    """
+    Features of one known document, computed once when it is added
+    """
+    __slots__ = ('text', 'tokens', 'counts', 'magnitude', 'ngram_count')
+    
+    text: str
+    tokens: List[str]
+    counts: Counter
+    magnitude: float
+    # The n-gram keys themselves live only in the checker's postings
+    ngram_count: int
+
+
+# Checker and prefilter setting a worker process analyzes documents with,
+# sent once per worker by _init_worker
+_worker_state = None
+
+
+def _init_worker(checker, prefilter: bool):
+    """Keep the checker shipped to this worker process."""
+    global _worker_state
+    _worker_state = (checker, prefilter)
+
+
+def _analyze_in_worker(item: Tuple[str, str]) -> Dict:
+    """Analyze one (document_id, document_text) pair in a worker process."""
+    checker, prefilter = _worker_state
+    document_id, document_text = item
+    return checker.analyze_document(document_text, document_id, prefilter)
+
+
 class EnhancedPlagiarismChecker:
     """
     Advanced plagiarism checker with multiple detection algorithms
@@ -21,15 +179,25 @@ class EnhancedPlagiarismChecker:
         self.threshold = threshold
         self.known_documents = {}
         
+        # KnownDoc features per known document id, and the token
+        # vocabulary they share; filled as documents are added
+        self._known_features = {}
+        self._vocab = {}
+        
+        # Inverted indexes from token id to (document id, count) postings and
+        # from n-gram key to document ids, filled as documents are added;
+        # dropped when a document is replaced and rebuilt on next use
+        self._postings = defaultdict(list)
+        self._ngram_postings = defaultdict(list)
+        
     def preprocess_text(self, text: str) -> str:
         """Clean and normalize text for analysis."""
-        # Convert to lowercase
-        text = text.lower()
-        # Remove special characters but keep spaces
-        text = re.sub(r'[^\w\s]', ' ', text)
-        # Remove extra whitespace
-        text = ' '.join(text.split())
-        return text
+        return ' '.join(self.preprocess_tokens(text))
+    
+    def preprocess_tokens(self, text: str) -> List[str]:
+        """Lowercase text, drop special characters and split it into words."""
+        # Splitting also collapses the extra whitespace left by the cleanup
+        return _CLEAN_RE.sub(' ', text.lower()).split()
     
     def extract_ngrams(self, text: str, n: int = 3) -> List[str]:
         """Extract n-grams from text for similarity detection."""
@@ -44,77 +212,129 @@ class EnhancedPlagiarismChecker:
         """Calculate Jaccard similarity between two sets."""
         if not set1 or not set2:
             return 0.0
-        intersection = len(set1.intersection(set2))
-        union = len(set1.union(set2))
-        return intersection / union if union > 0 else 0.0
+        # The intersection walks the smaller set; the union size follows
+        # from it without building a second set
+        return _jaccard_from_sizes(len(set1), len(set2), len(set1 & set2))
     
     def cosine_similarity(self, text1: str, text2: str) -> float:
         """Calculate cosine similarity between two texts."""
-        words1 = text1.split()
-        words2 = text2.split()
-        
-        # Create frequency vectors
-        counter1 = Counter(words1)
-        counter2 = Counter(words2)
-        
-        # Get all unique words
-        all_words = set(counter1.keys()).union(set(counter2.keys()))
-        
-        # Calculate dot product and magnitudes
-        dot_product = sum(counter1[word] * counter2[word] for word in all_words)
-        magnitude1 = sum(count ** 2 for count in counter1.values()) ** 0.5
-        magnitude2 = sum(count ** 2 for count in counter2.values()) ** 0.5
-        
+        counter1 = Counter(text1.split())
+        counter2 = Counter(text2.split())
+        return self._cosine_counts(counter1, _magnitude(counter1), counter2, _magnitude(counter2))
+    
+    def _cosine_counts(self, counter1: Counter, magnitude1: float,
+                       counter2: Counter, magnitude2: float) -> float:
+        """Cosine similarity between two term frequency vectors with known magnitudes."""
         if magnitude1 == 0 or magnitude2 == 0:
             return 0.0
         
+        # Words missing from either vector add nothing to the dot product, so
+        # walk the smaller one and look its words up in the other
+        if len(counter1) > len(counter2):
+            counter1, counter2 = counter2, counter1
+        get_count = counter2.get
+        dot_product = 0
+        for word, count in counter1.items():
+            dot_product += count * get_count(word, 0)
+        
         return dot_product / (magnitude1 * magnitude2)
     
     def find_matching_segments(self, text1: str, text2: str, min_length: int = 10) -> List[Dict]:
         """Find matching text segments between two documents."""
         words1 = text1.split()
-        words2 = text2.split()
-        matches = []
+        return [
+            {
+                'text': ' '.join(words1[i:i+length]),
+                'length': length,
+                'position1': i,
+                'position2': j
+            }
+            for i, j, length in self._matching_spans(words1, text2.split(), min_length)
+        ]
+    
+    def _matching_spans(self, words1: List[str], words2: List[str],
+                        min_length: int = 10) -> Iterator[Tuple[int, int, int]]:
+        """
+        Yield (position1, position2, length) for each matching segment
+        between two already split word lists, in find_matching_segments order.
+        """
+        # Index every min_length-word window of text2 by its words, so each
+        # window of text1 finds its equal windows with one dict lookup
+        windows2 = defaultdict(list)
+        for j in range(len(words2) - min_length + 1):
+            windows2[tuple(words2[j:j+min_length])].append(j)
         
-        # Simple sliding window approach
-        for i in range(len(words1) - min_length + 1):
-            segment1 = ' '.join(words1[i:i+min_length])
-            for j in range(len(words2) - min_length + 1):
-                segment2 = ' '.join(words2[j:j+min_length])
-                if segment1 == segment2:
-                    # Found a match, try to extend it
-                    length = min_length
-                    while (i + length < len(words1) and 
-                           j + length < len(words2) and 
-                           words1[i + length] == words2[j + length]):
-                        length += 1
-                    
-                    matches.append({
-                        'text': ' '.join(words1[i:i+length]),
-                        'length': length,
-                        'position1': i,
-                        'position2': j
-                    })
+        # Starts of repeated windows grouped by the word before them (None at
+        # the start of text2), built on first use
+        grouped2 = {}
         
-        return matches
+        for i in range(len(words1) - min_length + 1):
+            window = tuple(words1[i:i+min_length])
+            starts = windows2.get(window, ())
+            
+            if i and len(starts) > 1:
+                # On repetitive text most equal windows share the word before
+                # this one; skip them a group at a time rather than one by one
+                by_previous = grouped2.get(window)
+                if by_previous is None:
+                    by_previous = grouped2[window] = defaultdict(list)
+                    for j in starts:
+                        by_previous[words2[j - 1] if j else None].append(j)
+                groups = [group for previous, group in by_previous.items()
+                          if previous != words1[i - 1]]
+                starts = groups[0] if len(groups) == 1 else sorted(chain.from_iterable(groups))
+            
+            for j in starts:
+                # If the words before both windows are equal too, this window
+                # lies inside the match already reported one step back on the
+                # same diagonal; reporting it would repeat a shorter copy
+                if i and j and words1[i - 1] == words2[j - 1]:
+                    continue
+                
+                # Found a match, try to extend it
+                yield i, j, _extend_match(words1, words2, i, j, min_length)
     
-    def analyze_document(self, document_text: str, document_id: str = None) -> Dict:
+    def analyze_document(self, document_text: str, document_id: str = None,
+                         prefilter: bool = False) -> Dict:
         """
         Perform comprehensive plagiarism analysis on a document.
         
         Args:
             document_text: The text content to analyze
             document_id: Optional identifier for the document
+            prefilter: Passed through to analyze_tokens
+            
+        Returns:
+            Dictionary containing detailed analysis results
+        """
+        return self.analyze_tokens(self.preprocess_tokens(document_text), document_id, prefilter)
+    
+    def analyze_tokens(self, query_tokens: List[str], document_id: str = None,
+                       prefilter: bool = False) -> Dict:
+        """
+        Perform plagiarism analysis on an already preprocessed document.
+        
+        Args:
+            query_tokens: Words as returned by preprocess_tokens
+            document_id: Optional identifier for the document
+            prefilter: Skip cosine similarity for known documents whose
+                Jaccard similarity alone rules out reaching the threshold.
+                Their scores then count only the Jaccard share, so
+                max_similarity and average_similarity may be lower, while
+                is_plagiarized and similar_documents are unchanged.
             
         Returns:
             Dictionary containing detailed analysis results
         """
-        # Preprocess text
-        processed_text = self.preprocess_text(document_text)
+        # Known documents must be interned before the query borrows ids
+        self._sync_known_features()
         
-        # Extract features
-        ngrams = self.extract_ngrams(processed_text)
-        ngram_set = set(ngrams)
+        # Extract features over integer token ids
+        query_ids = _query_ids(query_tokens, self._vocab)
+        ngram_set = _ngram_keys(query_ids)
+        query_counts = Counter(query_ids)
+        query_magnitude = _magnitude(query_counts)
+        dot_products, shared_ngrams = self._corpus_overlap(query_counts, ngram_set)
         
         results = {
             'document_id': document_id,
@@ -130,13 +350,24 @@ class EnhancedPlagiarismChecker:
         
         # Check against all known documents
         similarities = []
-        for known_id, known_text in self.known_documents.items():
-            known_processed = self.preprocess_text(known_text)
-            known_ngrams = set(self.extract_ngrams(known_processed))
+        for known_id in self.known_documents:
+            known = self._known_features[known_id]
             
             # Calculate multiple similarity metrics
-            jaccard_sim = self.jaccard_similarity(ngram_set, known_ngrams)
-            cosine_sim = self.cosine_similarity(processed_text, known_processed)
+            if ngram_set and known.ngram_count:
+                jaccard_sim = _jaccard_from_sizes(
+                    len(ngram_set), known.ngram_count, shared_ngrams.get(known_id, 0)
+                )
+            else:
+                jaccard_sim = 0.0
+            if prefilter and jaccard_sim * 0.6 + 0.4 < self.threshold:
+                # Even a perfect cosine score could not reach the threshold
+                cosine_sim = 0.0
+            elif query_magnitude == 0 or known.magnitude == 0:
+                cosine_sim = 0.0
+            else:
+                cosine_sim = (dot_products.get(known_id, 0) /
+                              (query_magnitude * known.magnitude))
             
             # Combined similarity score
             combined_similarity = (jaccard_sim * 0.6 + cosine_sim * 0.4)
@@ -146,25 +377,30 @@ class EnhancedPlagiarismChecker:
                 results['max_similarity'] = combined_similarity
             
             if combined_similarity >= self.threshold:
-                # Find matching segments
-                matches = self.find_matching_segments(processed_text, known_processed)
+                # Find matching segments, keeping only the longest for the report
+                match_count, top_matches = _top_spans(
+                    self._matching_spans(query_tokens, known.tokens), 3
+                )
                 
                 results['similar_documents'].append({
                     'document_id': known_id,
                     'similarity_score': round(combined_similarity * 100, 2),
                     'jaccard_similarity': round(jaccard_sim * 100, 2),
                     'cosine_similarity': round(cosine_sim * 100, 2),
-                    'matching_segments': len(matches)
+                    'matching_segments': match_count
                 })
                 
                 # Add top matching parts
-                for match in matches[:3]:  # Top 3 matches
+                for i, _, length in top_matches:  # Top 3 matches
+                    # Every word adds at least two characters, so the first
+                    # 200 words already cover the 200 characters reported
+                    text = ' '.join(query_tokens[i:i + min(length, 200)])
                     results['matching_parts'].append({
                         'source_document': known_id,
-                        'matched_text': match['text'][:200] + '...' if len(match['text']) > 200 else match['text'],
-                        'length_words': match['length'],
+                        'matched_text': text[:200] + '...' if len(text) > 200 else text,
+                        'length_words': length,
                         'similarity_score': round(combined_similarity * 100, 2),
-                        'explanation': f'Exact match of {match["length"]} consecutive words found in {known_id}'
+                        'explanation': f'Exact match of {length} consecutive words found in {known_id}'
                     })
         
         # Calculate average similarity
@@ -182,16 +418,123 @@ class EnhancedPlagiarismChecker:
         
         return results
     
+    def analyze_documents(self, documents: Dict[str, str], workers: int = 1,
+                          prefilter: bool = False) -> List[Dict]:
+        """
+        Run analyze_document over a batch of documents.
+        
+        Args:
+            documents: Mapping of document id to text content
+            workers: Number of worker processes; 1 analyzes in this process
+            prefilter: Passed through to analyze_document
+            
+        Returns:
+            List of analysis results, in the same order as documents
+        """
+        # Intern known documents first so workers receive finished features
+        self._sync_known_features()
+        items = list(documents.items())
+        
+        if workers <= 1 or len(items) < 2:
+            return [self.analyze_document(text, doc_id, prefilter) for doc_id, text in items]
+        
+        # Known features are pickled once per worker rather than per document;
+        # a single query is too cheap to pay for that, so only batches go here
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self, prefilter)) as pool:
+            chunksize = max(1, len(items) // (4 * workers))
+            return list(pool.map(_analyze_in_worker, items, chunksize=chunksize))
+    
     def add_known_document(self, document_id: str, document_text: str):
         """Add a document to the known documents database."""
         self.known_documents[document_id] = document_text
+        self._cache_known_features(document_id, document_text)
     
     def load_known_documents(self, documents: Dict[str, str]):
         """Load multiple known documents at once."""
         self.known_documents.update(documents)
+        for document_id, document_text in documents.items():
+            self._cache_known_features(document_id, document_text)
+    
+    def _corpus_overlap(self, query_counts: Counter,
+                        query_ngrams: set) -> Tuple[Dict[str, int], Dict[str, int]]:
+        """
+        Overlap of the query with every known document at once.
+        
+        Returns the dot product of term counts and the number of shared
+        n-grams per known document. Only the postings of the query's own
+        terms and n-grams are walked, so known documents sharing nothing
+        with the query cost nothing; those are left out.
+        """
+        if self._postings is None:
+            self._postings = defaultdict(list)
+            self._ngram_postings = defaultdict(list)
+            for document_id, known in self._known_features.items():
+                # Only n-gram counts are cached, so recover the keys from the
+                # tokens, whose ids never change once interned
+                ngrams = _ngram_keys([self._vocab[word] for word in known.tokens])
+                self._add_postings(document_id, known.counts, ngrams)
+        
+        dot_products = defaultdict(int)
+        for token_id, query_count in query_counts.items():
+            for document_id, count in self._postings.get(token_id, ()):
+                dot_products[document_id] += query_count * count
+        
+        shared_ngrams = defaultdict(int)
+        for key in query_ngrams:
+            for document_id in self._ngram_postings.get(key, ()):
+                shared_ngrams[document_id] += 1
+        
+        return dot_products, shared_ngrams
+    
+    def _add_postings(self, document_id: str, counts: Counter, ngrams: set):
+        """Index a known document's term counts and n-grams."""
+        for token_id, count in counts.items():
+            self._postings[token_id].append((document_id, count))
+        for key in ngrams:
+            self._ngram_postings[key].append(document_id)
+    
+    def _cache_known_features(self, document_id: str, document_text: str):
+        """Preprocess a known document once and keep what comparisons need."""
+        tokens = self.preprocess_tokens(document_text)
+        ids = _tokens_to_ids(tokens, self._vocab)
+        counts = Counter(ids)
+        ngrams = _ngram_keys(ids)
+        
+        if self._postings is not None:
+            if document_id in self._known_features:
+                # Replaced documents leave stale postings; rebuild on next use
+                self._postings = None
+            else:
+                self._add_postings(document_id, counts, ngrams)
+        
+        self._known_features[document_id] = KnownDoc(
+            text=document_text,
+            tokens=tokens,
+            counts=counts,
+            magnitude=_magnitude(counts),
+            ngram_count=len(ngrams)
+        )
+    
+    def _sync_known_features(self):
+        """Refresh cached features for known documents changed in place."""
+        for document_id, document_text in self.known_documents.items():
+            known = self._known_features.get(document_id)
+            if known is None or known.text is not document_text:
+                self._cache_known_features(document_id, document_text)
+        
+        if len(self._known_features) > len(self.known_documents):
+            # Drop entries for documents removed from known_documents
+            self._known_features = {
+                doc_id: known for doc_id, known in self._known_features.items()
+                if doc_id in self.known_documents
+            }
+            self._postings = None
     
     def generate_document_hash(self, document_text: str) -> str:
         """Generate SHA-256 hash for a document."""
+        # Must stay SHA-256 over UTF-8: the Node services hash documents and
+        # chunks the same way, and those digests are recorded on chain
         return hashlib.sha256(document_text.encode('utf-8')).hexdigest()
 
 
@@ -204,10 +547,6 @@ def main():
     file_path = sys.argv[1]
     
     try:
-        # Read document
-        with open(file_path, 'r', encoding='utf-8') as f:
-            document_text = f.read()
-        
         # Initialize checker
         checker = EnhancedPlagiarismChecker(threshold=0.70)
         
@@ -221,8 +560,12 @@ def main():
             "Deep learning and neural networks have revolutionized artificial intelligence research."
         )
         
+        # Read the document in chunks; only its word list is held in full
+        with open(file_path, 'r', encoding='utf-8') as f:
+            document_tokens = list(_iter_tokens(f))
+        
         # Analyze document
-        results = checker.analyze_document(document_text, file_path)
+        results = checker.analyze_tokens(document_tokens, file_path)
         
         # Output results as JSON
         print(json.dumps(results, indent=2))
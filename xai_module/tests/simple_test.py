@@ -4,56 +4,63 @@ Simple XAI Modules Test
 Quick test to verify all modules produce valid JSON output
 """
 
+import contextlib
+import importlib
+import io
 import json
 import sys
 import tempfile
 import os
 from pathlib import Path
+from unittest import mock
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-def test_module(module_name, script_name, test_content):
+def run_module(script_name, temp_file):
+    """Run a module's main() in this process, as if called from the command line"""
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    module = importlib.import_module(Path(script_name).stem)
+    
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr), \
+            mock.patch.object(sys, 'argv', [script_name, temp_file]):
+        try:
+            module.main()
+        except SystemExit as e:
+            returncode = e.code if isinstance(e.code, int) else 1
+    return returncode, stdout.getvalue(), stderr.getvalue()
+
+def test_module(module_name, script_name, test_content, temp_file):
     """Test a single XAI module"""
     print(f"\n🔍 Testing {module_name}...")
     
-    # Create temporary test file
-    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
-        f.write(test_content)
-        temp_file = f.name
-    
     try:
-        # Run the Python script
-        import subprocess
-        result = subprocess.run(
-            [sys.executable, str(BASE_DIR / script_name), temp_file],
-            capture_output=True,
-            text=True,
-            timeout=10,
-            cwd=str(BASE_DIR)
-        )
+        # Reuse the shared test file, overwriting the previous module's content
+        with open(temp_file, 'w') as f:
+            f.write(test_content)
         
-        # Clean up
-        os.unlink(temp_file)
+        # Run the module in-process instead of spawning an interpreter
+        returncode, stdout, stderr = run_module(script_name, temp_file)
         
-        if result.returncode != 0:
-            print(f"   ❌ Script exited with error: {result.stderr[:200]}")
+        if returncode != 0:
+            print(f"   ❌ Script exited with error: {stderr[:200]}")
             return False
         
         # Parse JSON output
         try:
-            data = json.loads(result.stdout)
+            data = json.loads(stdout)
             print(f"   ✅ Valid JSON output received")
             print(f"   📊 Keys: {', '.join(data.keys())}")
             return True
         except json.JSONDecodeError as e:
             print(f"   ❌ Invalid JSON output: {str(e)}")
-            print(f"   Output: {result.stdout[:200]}")
+            print(f"   Output: {stdout[:200]}")
             return False
             
     except Exception as e:
         print(f"   ❌ Test failed: {str(e)}")
-        if os.path.exists(temp_file):
-            os.unlink(temp_file)
         return False
 
 def main():
@@ -63,30 +70,40 @@ def main():
     
     results = {}
     
-    # Test 1: Plagiarism Checker
-    results['Plagiarism Checker'] = test_module(
-        'Plagiarism Checker',
-        'enhanced_plagiarism_check.py',
-        'This is a test document for plagiarism detection. It contains sample text.'
-    )
-    
-    # Test 2: AI Content Detector
-    results['AI Content Detector'] = test_module(
-        'AI Content Detector',
-        'ai_content_detector.py',
-        'In contemporary society, the utilization of advanced technologies demonstrates significant implications.'
-    )
+    # One test file shared by all modules
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.txt', delete=False) as f:
+        temp_file = f.name
     
-    # Test 3: Certificate Forgery Detector
-    results['Certificate Forgery Detector'] = test_module(
-        'Certificate Forgery Detector',
-        'certificate_forgery_detector.py',
-        '''CERTIFICATE OF ACHIEVEMENT
+    try:
+        # Test 1: Plagiarism Checker
+        results['Plagiarism Checker'] = test_module(
+            'Plagiarism Checker',
+            'enhanced_plagiarism_check.py',
+            'This is a test document for plagiarism detection. It contains sample text.',
+            temp_file
+        )
+        
+        # Test 2: AI Content Detector
+        results['AI Content Detector'] = test_module(
+            'AI Content Detector',
+            'ai_content_detector.py',
+            'In contemporary society, the utilization of advanced technologies demonstrates significant implications.',
+            temp_file
+        )
+        
+        # Test 3: Certificate Forgery Detector
+        results['Certificate Forgery Detector'] = test_module(
+            'Certificate Forgery Detector',
+            'certificate_forgery_detector.py',
+            '''CERTIFICATE OF ACHIEVEMENT
         
 This certifies that John Smith completed the course.
 Date: 2024-01-15
-Certificate Number: CERT-2024-001'''
-    )
+Certificate Number: CERT-2024-001''',
+            temp_file
+        )
+    finally:
+        os.unlink(temp_file)
     
     # Summary
     print("\n" + "="*70)
@@ -93,6 +93,163 @@ def test_plagiarism_checker():
         print_error(f"Plagiarism checker test failed: {str(e)}")
         return False
 
+def test_segment_matching():
+    """Test that matching segments are reported once per shared passage"""
+    print_header("Testing Segment Matching")
+    
+    try:
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from enhanced_plagiarism_check import EnhancedPlagiarismChecker
+        
+        checker = EnhancedPlagiarismChecker(threshold=0.1)
+        fox = "The quick brown fox jumps over the lazy dog. " * 3
+        
+        # Test 1: Only maximal matches, no shorter copies shifted along them
+        print_info("Test 1: Repetitive text matched against itself")
+        processed = checker.preprocess_text(fox)
+        matches = checker.find_matching_segments(processed, processed)
+        spans = [(m['position1'], m['position2'], m['length']) for m in matches]
+        assert spans == [(0, 0, 27), (0, 9, 18), (9, 0, 18)], spans
+        assert matches[1]['text'] == ' '.join(processed.split()[:18])
+        print_success(f"{len(spans)} maximal matches reported")
+        
+        # Test 2: The document summary counts the same matches
+        print_info("\nTest 2: Matching segment count in the analysis")
+        checker.add_known_document('fox', fox)
+        result = checker.analyze_document(fox)
+        assert result['similar_documents'][0]['matching_segments'] == 3
+        print_success("Analysis counts each shared passage once")
+        
+        # Test 3: Reported parts are the longest matches, earliest first on ties
+        print_info("\nTest 3: Top matching parts ordering")
+        def passage(prefix, length):
+            return ' '.join(f'{prefix}{i}' for i in range(length))
+        
+        known = ' '.join([passage('a', 10), 'k1', passage('b', 15), 'k2',
+                          passage('c', 12), 'k3', passage('d', 12)])
+        query = ' '.join(['q0', passage('a', 10), 'q1', passage('b', 15), 'q2',
+                          passage('c', 12), 'q3', passage('d', 12)])
+        checker = EnhancedPlagiarismChecker(threshold=0.1)
+        checker.add_known_document('source', known)
+        result = checker.analyze_document(query)
+        
+        assert result['similar_documents'][0]['matching_segments'] == 4
+        parts = [(p['length_words'], p['matched_text']) for p in result['matching_parts']]
+        assert parts == [(15, passage('b', 15)), (12, passage('c', 12)), (12, passage('d', 12))], parts
+        print_success("Longest matches reported first, ties in text order")
+        return True
+        
+    except Exception as e:
+        print_error(f"Segment matching test failed: {e!r}")
+        return False
+
+def test_plagiarism_prefilter():
+    """Test that the Jaccard prefilter keeps plagiarism verdicts unchanged"""
+    print_header("Testing Plagiarism Prefilter")
+    
+    try:
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from enhanced_plagiarism_check import EnhancedPlagiarismChecker
+        
+        source = """
+        Machine learning models learn patterns from data and use them to make predictions.
+        Training adjusts the model parameters to reduce the error on known examples, while
+        validation on held out data shows how well the model generalizes to new inputs.
+        """
+        checker = EnhancedPlagiarismChecker(threshold=0.7)
+        checker.add_known_document('copy', source)
+        checker.add_known_document('edited', source.replace('patterns', 'structure').replace('error', 'loss'))
+        checker.add_known_document('related', "Models learn from data; training reduces error on examples.")
+        checker.add_known_document('unrelated', "The weather was sunny and warm for the whole week in July.")
+        
+        print_info("Test 1: Prefiltered analysis against the full analysis")
+        lowered = 0
+        for query in (source, source.replace('data', 'records'), "Training models on data."):
+            full = checker.analyze_document(query)
+            filtered = checker.analyze_document(query, prefilter=True)
+            for key in ('is_plagiarized', 'similar_documents', 'matching_parts'):
+                assert filtered[key] == full[key], key
+            assert filtered['max_similarity'] <= full['max_similarity']
+            assert filtered['average_similarity'] <= full['average_similarity']
+            lowered += filtered['average_similarity'] < full['average_similarity']
+        # Some documents must actually have been skipped
+        assert lowered > 0
+        print_success("Verdicts and matches unchanged, similarities never higher")
+        return True
+        
+    except Exception as e:
+        print_error(f"Plagiarism prefilter test failed: {e!r}")
+        return False
+
+def test_plagiarism_workers():
+    """Test that batch analysis in worker processes matches the serial run"""
+    print_header("Testing Plagiarism Batch Workers")
+    
+    try:
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from enhanced_plagiarism_check import EnhancedPlagiarismChecker
+        
+        checker = EnhancedPlagiarismChecker(threshold=0.5)
+        checker.add_known_document('ml', "Machine learning models learn patterns from data to make predictions.")
+        checker.add_known_document('dl', "Deep learning and neural networks have changed artificial intelligence research.")
+        documents = {
+            'copy': "Machine learning models learn patterns from data to make predictions.",
+            'partial': "Neural networks have changed artificial intelligence research a lot.",
+            'other': "The weather was sunny and warm for the whole week.",
+            'empty': "",
+            'mixed': "Deep learning models learn patterns from data and neural networks."
+        }
+        
+        print_info("Test 1: Two worker processes against one")
+        serial = checker.analyze_documents(documents)
+        parallel = checker.analyze_documents(documents, workers=2)
+        assert [r['document_id'] for r in parallel] == list(documents)
+        assert parallel == serial
+        print_success(f"{len(parallel)} results identical and in input order")
+        return True
+        
+    except Exception as e:
+        print_error(f"Plagiarism batch workers test failed: {e!r}")
+        return False
+
+def test_plagiarism_streaming():
+    """Test that streamed tokens match whole-text preprocessing"""
+    print_header("Testing Plagiarism Streaming Input")
+    
+    try:
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        import io
+        from enhanced_plagiarism_check import EnhancedPlagiarismChecker, _iter_tokens
+        
+        checker = EnhancedPlagiarismChecker()
+        texts = [
+            "Hello, World!  This is\ta test...\nWith  Ünïcode words\n",
+            "no-whitespace-at-all-" * 50,
+            "   leading and trailing spaces   ",
+            ""
+        ]
+        
+        # Test 1: Chunk boundaries never split or merge words
+        print_info("Test 1: Chunked reading against preprocess_tokens")
+        for text in texts:
+            expected = checker.preprocess_tokens(text)
+            for chunk_size in (1, 2, 3, 7, 64):
+                assert list(_iter_tokens(io.StringIO(text), chunk_size)) == expected, (text, chunk_size)
+        print_success("Streamed words identical for every chunk size")
+        
+        # Test 2: Analysis of preprocessed tokens matches analysis of the text
+        print_info("\nTest 2: analyze_tokens against analyze_document")
+        checker.add_known_document('sample', texts[0])
+        for text in texts:
+            tokens = checker.preprocess_tokens(text)
+            assert checker.analyze_tokens(tokens, 'doc') == checker.analyze_document(text, 'doc')
+        print_success("analyze_tokens gives the same results")
+        return True
+        
+    except Exception as e:
+        print_error(f"Plagiarism streaming test failed: {e!r}")
+        return False
+
 def test_ai_content_detector():
     """Test AI-generated content detection"""
     print_header("Testing AI Content Detector")
@@ -160,6 +317,54 @@ def test_ai_content_detector():
         print_error(f"AI content detector test failed: {str(e)}")
         return False
 
+def test_ai_early_exit():
+    """Test that early-exit scoring keeps the full run's verdicts"""
+    print_header("Testing AI Detector Early Exit")
+    
+    try:
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from ai_content_detector import AIContentDetector
+        
+        detector = AIContentDetector()
+        texts = [
+            """I've been thinking about this problem for weeks now, and honestly, I'm not entirely
+            sure what the best approach would be. My initial idea was to use a simple algorithm,
+            but then I realized that wouldn't work for edge cases.""",
+            """Furthermore, it is important to note the implications. Moreover, it is essential to
+            recognize the shift. Additionally, the implementation requires care. Consequently,
+            stakeholders must collaborate. Therefore, it is crucial to establish guidelines.
+            Moreover, it is essential to act.""",
+            "Short text here."
+        ]
+        
+        # Test 1: Same verdicts; analyses that ran match, skipped ones are None
+        print_info("Test 1: Early exit against the full analysis")
+        skipped = 0
+        for text in texts:
+            full = detector.analyze_text(text)
+            early = detector.analyze_text(text, early_exit=True)
+            assert early['is_ai_generated'] == full['is_ai_generated']
+            assert early['detailed_analysis'].keys() == full['detailed_analysis'].keys()
+            for key, analysis in early['detailed_analysis'].items():
+                if analysis is None:
+                    skipped += 1
+                else:
+                    assert analysis == full['detailed_analysis'][key], key
+        assert skipped > 0
+        print_success(f"Verdicts unchanged, {skipped} analyses skipped and reported as None")
+        
+        # Test 2: Batch analysis matches one call per text
+        print_info("\nTest 2: Batch analysis")
+        for early_exit in (False, True):
+            expected = [detector.analyze_text(text, early_exit) for text in texts]
+            assert detector.analyze_texts(texts, early_exit) == expected
+        print_success("analyze_texts returns the per-text results in order")
+        return True
+        
+    except Exception as e:
+        print_error(f"AI detector early exit test failed: {e!r}")
+        return False
+
 def test_certificate_forgery_detector():
     """Test certificate forgery detection"""
     print_header("Testing Certificate Forgery Detector")
@@ -232,6 +437,72 @@ def test_certificate_forgery_detector():
         print_error(f"Certificate forgery detector test failed: {str(e)}")
         return False
 
+def test_certificate_index_consistency():
+    """Test that certificate lookups follow changes to known_certificates"""
+    print_header("Testing Certificate Index Consistency")
+    
+    try:
+        sys.path.insert(0, str(Path(__file__).parent.parent))
+        from certificate_forgery_detector import CertificateForgeryDetector
+        
+        def make_cert(title, name, number, issuer):
+            return f"""
+            {title}
+            This is to certify that {name} has successfully completed the course.
+            Certificate Number: {number}
+            Issued by: {issuer}
+            Date: 2024-01-15
+            """
+        
+        cert_a = make_cert('CERTIFICATE OF COMPLETION', 'Alice Walker', 'AW-2024-001', 'University of Dhaka')
+        cert_b = make_cert('CERTIFICATE OF ACHIEVEMENT', 'Bob Stone', 'BS-2024-002', 'Stanford University Online')
+        cert_c = make_cert('CERTIFICATE OF MERIT', 'Carol King', 'CK-2024-003', 'Oxford Online Academy')
+        
+        def duplicate_ids(detector, text):
+            result = detector.analyze_certificate(text)
+            return [(d['certificate_id'], d['similarity']) for d in result['duplicate_certificates']]
+        
+        detector = CertificateForgeryDetector()
+        detector.add_known_certificate('A', cert_a)
+        detector.add_known_certificate('B', cert_b)
+        assert duplicate_ids(detector, cert_a) == [('A', 100.0)]
+        
+        # Test 1: Removal shifts positions; the new certificate must be found
+        print_info("Test 1: Remove a known certificate, then add another")
+        detector.known_certificates.pop(0)
+        detector.add_known_certificate('C', cert_c)
+        assert duplicate_ids(detector, cert_c) == [('C', 100.0)]
+        assert duplicate_ids(detector, cert_a) == []
+        print_success("Certificate added after a removal is detected as duplicate")
+        
+        # Test 2: Replacing an entry keeps the list length unchanged
+        print_info("\nTest 2: Replace a known certificate in place")
+        detector.known_certificates[0] = {
+            'id': 'A2',
+            'text': cert_a,
+            'extracted_info': detector.extract_certificate_info(cert_a)
+        }
+        assert duplicate_ids(detector, cert_a) == [('A2', 100.0)]
+        assert duplicate_ids(detector, cert_b) == []
+        print_success("Replaced certificate is detected, the old one is gone")
+        
+        # Test 3: Editing a known certificate's fields in place
+        print_info("\nTest 3: Edit a known certificate's text and info in place")
+        detector.known_certificates[1]['text'] = cert_b
+        detector.known_certificates[1]['extracted_info'] = detector.extract_certificate_info(cert_b)
+        assert duplicate_ids(detector, cert_b) == [('C', 100.0)]
+        assert duplicate_ids(detector, cert_c) == []
+        print_success("Edited certificate is compared with its new content")
+        
+        # Cached features must stay off the certificate dicts
+        json.dumps(detector.known_certificates)
+        print_success("Known certificates remain JSON-serialisable")
+        return True
+        
+    except Exception as e:
+        print_error(f"Certificate index consistency test failed: {e!r}")
+        return False
+
 def test_json_output():
     """Test that all modules produce valid JSON"""
     print_header("Testing JSON Output Format")
@@ -301,8 +572,14 @@ def main():
     
     results = {
         'Plagiarism Checker': test_plagiarism_checker(),
+        'Segment Matching': test_segment_matching(),
+        'Plagiarism Prefilter': test_plagiarism_prefilter(),
+        'Plagiarism Batch Workers': test_plagiarism_workers(),
+        'Plagiarism Streaming Input': test_plagiarism_streaming(),
         'AI Content Detector': test_ai_content_detector(),
+        'AI Detector Early Exit': test_ai_early_exit(),
         'Certificate Forgery Detector': test_certificate_forgery_detector(),
+        'Certificate Index Consistency': test_certificate_index_consistency(),
         'JSON Output Validation': test_json_output()
     }
     